@@ -1,15 +1,57 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import base64
+import configparser
+import os
+import time
+from contextlib import asynccontextmanager
 from io import BytesIO
+from urllib.parse import quote
 from PIL import Image
 
 from src.llm.prompt_engineering import engineer_generation_prompt, engineer_editing_prompt
 from src.image_gen.generate import generate_image
 from src.image_edit.edit import edit_image
+from src.llm.embedding import embed_text, EMBEDDING_DIM
+from src.storage.output_writer import OutputWriter
+from src.storage.prompt_index import PromptIndex
 
-app = FastAPI()
+# Parameters passed to the diffusion pipelines (also recorded in the output index)
+GENERATION_PARAMS = {"num_inference_steps": 30, "guidance_scale": 7.5}
+EDIT_PARAMS = {"strength": 0.7, "guidance_scale": 8}
+
+# Default similarity fast path for /generate: "off", "prompt" (reuse engineered prompt) or
+# "image" (reuse image, falling back to the engineered prompt between the two thresholds)
+config = configparser.ConfigParser()
+config.read(os.path.join(os.path.dirname(__file__), "config.ini"))
+FAST_PATH = config.get("Similarity", "fast_path", fallback="off")
+FAST_PATH_MODES = ("off", "prompt", "image")
+if FAST_PATH not in FAST_PATH_MODES:
+    raise ValueError(f"[Similarity] fast_path in config.ini must be one of {', '.join(FAST_PATH_MODES)}, got {FAST_PATH!r}")
+
+# Longest URL-quoted engineered text sent in a response header; proxies commonly cap headers at 8 KB
+MAX_TEXT_HEADER_LENGTH = 4096
+
+# Model calls run in the threadpool so the event loop stays free for fast-path hits; this lock
+# keeps them to one job at a time on the GPU without tying up threadpool workers while waiting
+gpu_lock = asyncio.Lock()
+
+# Saves outputs in a background thread so disk I/O stays off the response path
+output_writer = OutputWriter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Finish writing queued outputs before the server exits
+    output_writer.close(timeout=30)
+
+app = FastAPI(lifespan=lifespan)
+
+# Nearest-neighbour index over past prompts for serving near-duplicate requests
+prompt_index = PromptIndex(embed_text, EMBEDDING_DIM)
 
 # Allow CORS for Gradio UI
 app.add_middleware(
@@ -18,50 +60,124 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Engineered-Prompt", "X-Engineered-Edit"],
 )
 
-def pil_to_base64(img: Image.Image) -> str:
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def pil_to_png_bytes(img: Image.Image) -> bytes:
     buf = BytesIO()
     img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode()
+    return buf.getvalue()
 
 def base64_to_pil(data: str) -> Image.Image:
     return Image.open(BytesIO(base64.b64decode(data)))
 
+def image_response(request: Request, text_key: str, text: str, png: bytes):
+    """
+    Return the PNG bytes (engineered text in an X- header) to clients that accept image/png,
+    otherwise the JSON payload with a base64 image. Text too long for a header also falls back to JSON.
+    """
+    quoted = quote(text)
+    if "image/png" in request.headers.get("accept", "") and len(quoted) <= MAX_TEXT_HEADER_LENGTH:
+        header = "X-" + text_key.replace("_", "-").title()
+        return Response(content=png, media_type="image/png", headers={header: quoted})
+    return JSONResponse({text_key: text, "image": base64.b64encode(png).decode()})
+
 @app.post("/generate")
-async def generate(prompt: str = Form(...)):
+async def generate(request: Request, prompt: str = Form(...), fast_path: str = Form(None)):
     """
-    Accepts a user prompt, engineers it, generates an image, and returns the image as base64.
+    Accepts a user prompt, engineers it, generates an image, and returns the image (PNG bytes or base64 JSON).
+    With fast_path="prompt" a near-duplicate past prompt's engineered prompt is reused; with fast_path="image"
+    a match above image_threshold returns its stored image without running diffusion, and a match between
+    prompt_threshold and image_threshold falls back to reusing its engineered prompt.
     """
-    engineered = engineer_generation_prompt(prompt)
-    img = generate_image(engineered)
-    img_b64 = pil_to_base64(img)
-    return JSONResponse({"engineered_prompt": engineered, "image": img_b64})
+    fast_path = fast_path or FAST_PATH
+    if fast_path not in FAST_PATH_MODES:
+        raise HTTPException(status_code=400, detail=f"fast_path must be one of {', '.join(FAST_PATH_MODES)}")
+
+    start = time.perf_counter()
+    # The embedding forward pass runs in the threadpool so it doesn't block the event loop
+    match, vector = await run_in_threadpool(prompt_index.lookup, prompt)
+    timings = {"lookup_ms": elapsed_ms(start)}
+    if match and fast_path == "image" and match["score"] >= prompt_index.image_threshold:
+        prompt_index.record_served("image")
+        return image_response(request, "engineered_prompt", match["engineered"], match["png"])
+
+    async with gpu_lock:
+        start = time.perf_counter()
+        if match and fast_path != "off":
+            engineered = match["engineered"]
+            prompt_index.record_served("prompt")
+        else:
+            engineered = await run_in_threadpool(engineer_generation_prompt, prompt)
+        timings["engineer_ms"] = elapsed_ms(start)
+        start = time.perf_counter()
+        img = await run_in_threadpool(generate_image, engineered, **GENERATION_PARAMS)
+        timings["generate_ms"] = elapsed_ms(start)
+    # Encode once; the same bytes go to the client, the prompt index and the output writer
+    png = await run_in_threadpool(pil_to_png_bytes, img)
+    # Replace a near-duplicate's entry rather than filling the index with copies of it
+    if not (match and prompt_index.update(match, vector, prompt, engineered, png)):
+        prompt_index.insert(vector, prompt, engineered, png)
+    output_writer.submit(png, "generate", prompt, engineered, GENERATION_PARAMS, timings)
+    return image_response(request, "engineered_prompt", engineered, png)
 
 @app.post("/edit")
 async def edit(
+    request: Request,
     image: UploadFile = File(...),
     instruction: str = Form(...)
 ):
     """
-    Accepts an uploaded image and edit instruction, engineers the instruction, edits the image, and returns the edited image as base64.
+    Accepts an uploaded image and edit instruction, engineers the instruction, edits the image, and returns the edited image (PNG bytes or base64 JSON).
     """
     img = Image.open(image.file).convert("RGB")
-    engineered = engineer_editing_prompt(instruction)
-    edited = edit_image(img, engineered)
-    img_b64 = pil_to_base64(edited)
-    return JSONResponse({"engineered_edit": engineered, "image": img_b64})
+    async with gpu_lock:
+        start = time.perf_counter()
+        engineered = await run_in_threadpool(engineer_editing_prompt, instruction)
+        timings = {"engineer_ms": elapsed_ms(start)}
+        start = time.perf_counter()
+        edited = await run_in_threadpool(edit_image, img, engineered, **EDIT_PARAMS)
+        timings["edit_ms"] = elapsed_ms(start)
+    png = await run_in_threadpool(pil_to_png_bytes, edited)
+    output_writer.submit(png, "edit", instruction, engineered, EDIT_PARAMS, timings)
+    return image_response(request, "engineered_edit", engineered, png)
 
 @app.post("/edit-generated")
 async def edit_generated(
+    request: Request,
     image_b64: str = Form(...),
     instruction: str = Form(...)
 ):
     """
-    Accepts a base64 image (from previous generation) and edit instruction, engineers the instruction, edits the image, and returns the edited image as base64.
+    Accepts a base64 image (from previous generation) and edit instruction, engineers the instruction, edits the image, and returns the edited image (PNG bytes or base64 JSON).
     """
     img = base64_to_pil(image_b64)
-    engineered = engineer_editing_prompt(instruction)
-    edited = edit_image(img, engineered)
-    img_b64 = pil_to_base64(edited)
-    return JSONResponse({"engineered_edit": engineered, "image": img_b64})
\ No newline at end of file
+    async with gpu_lock:
+        start = time.perf_counter()
+        engineered = await run_in_threadpool(engineer_editing_prompt, instruction)
+        timings = {"engineer_ms": elapsed_ms(start)}
+        start = time.perf_counter()
+        edited = await run_in_threadpool(edit_image, img, engineered, **EDIT_PARAMS)
+        timings["edit_ms"] = elapsed_ms(start)
+    png = await run_in_threadpool(pil_to_png_bytes, edited)
+    output_writer.submit(png, "edit-generated", instruction, engineered, EDIT_PARAMS, timings)
+    return image_response(request, "engineered_edit", engineered, png)
+
+@app.get("/outputs")
+def list_outputs(offset: int = 0, limit: int = 20):
+    """
+    Returns a page of saved outputs (newest first) from the output index, with paths relative to the output directory.
+    Plain def so FastAPI runs the index reads in its threadpool, off the event loop.
+    """
+    limit = max(1, min(limit, 100))
+    return JSONResponse(output_writer.list_outputs(max(offset, 0), limit))
+
+@app.get("/similarity/stats")
+async def similarity_stats():
+    """
+    Returns size, hit rates and average lookup latency of the prompt similarity index.
+    """
+    return JSONResponse(prompt_index.stats())
@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import configparser
+import json
+import os
+from io import BytesIO
+from urllib.parse import unquote
+
+import httpx
+from PIL import Image
+
+# Load API URL and client settings from config.ini
+config = configparser.ConfigParser()
+config.read(os.path.join(os.path.dirname(__file__), "../config.ini"))
+API_URL = config.get("API", "url")
+
+CONNECT_TIMEOUT = config.getfloat("Client", "connect_timeout", fallback=10.0)
+READ_TIMEOUT = config.getfloat("Client", "read_timeout", fallback=300.0)
+POOL_TIMEOUT = config.getfloat("Client", "pool_timeout", fallback=30.0)
+MAX_CONNECTIONS = config.getint("Client", "max_connections", fallback=64)
+MAX_KEEPALIVE_CONNECTIONS = config.getint("Client", "max_keepalive_connections", fallback=32)
+KEEPALIVE_EXPIRY = config.getfloat("Client", "keepalive_expiry", fallback=60.0)
+MAX_RETRIES = config.getint("Client", "max_retries", fallback=3)
+BACKOFF_FACTOR = config.getfloat("Client", "backoff_factor", fallback=0.5)
+
+# Ask for raw PNG bytes; servers that only speak JSON still answer with base64
+ACCEPT_HEADER = "image/png, application/json;q=0.9"
+
+# Failures where the request was never handed to the model, so resending is safe.
+# Read timeouts, dropped connections (RemoteProtocolError) and proxy 502/504s are not
+# retried: the backend may still be running the job, and these POSTs are not idempotent.
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_STATUS_CODES = {503}
+
+
+def image_to_png_bytes(img: Image.Image) -> bytes:
+    """Encode a PIL Image as PNG bytes"""
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def bytes_to_image(data: bytes) -> Image.Image:
+    """Decode encoded image bytes into a PIL Image object"""
+    return Image.open(BytesIO(data))
+
+
+class APIClient:
+    """
+    Async client for the FastAPI backend, sharing one pooled keep-alive session
+    across all UI sessions. Every call returns (engineered_text, image_bytes).
+    """
+
+    def __init__(self, base_url: str = API_URL, max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(max_retries, 0)
+        self.backoff_factor = backoff_factor
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the session binds to the event loop that serves the UI
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                headers={"Accept": ACCEPT_HEADER},
+            )
+        return self._client
+
+    async def _post(self, path: str, text_key: str, data: dict, files: dict = None):
+        """POST with retries and exponential backoff, streaming the response body"""
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                async with client.stream("POST", path, data=data, files=files) as resp:
+                    if resp.status_code in RETRY_STATUS_CODES and not last_attempt:
+                        await resp.aclose()
+                    else:
+                        resp.raise_for_status()
+                        body = BytesIO()
+                        async for chunk in resp.aiter_bytes():
+                            body.write(chunk)
+                        return self._parse(resp, body.getvalue(), text_key)
+            except RETRY_EXCEPTIONS:
+                if last_attempt:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    @staticmethod
+    def _parse(resp: httpx.Response, body: bytes, text_key: str):
+        """Read (engineered_text, image_bytes) from a binary or JSON response"""
+        if resp.headers.get("content-type", "").startswith("image/"):
+            header = "X-" + text_key.replace("_", "-").title()
+            return unquote(resp.headers.get(header, "")), body
+        data = json.loads(body)
+        return data[text_key], base64.b64decode(data["image"])
+
+    async def generate(self, prompt: str, fast_path: str = None):
+        """Send prompt to /generate endpoint (fast_path: "off", "prompt" or "image")"""
+        data = {"prompt": prompt}
+        if fast_path is not None:
+            data["fast_path"] = fast_path
+        return await self._post("/generate", "engineered_prompt", data)
+
+    async def edit(self, image_bytes: bytes, instruction: str):
+        """Send encoded image bytes + instruction to /edit endpoint"""
+        files = {"image": ("image.png", image_bytes, "image/png")}
+        return await self._post("/edit", "engineered_edit", {"instruction": instruction}, files=files)
+
+    async def edit_generated(self, image_bytes: bytes, instruction: str):
+        """Send base64 image + instruction to /edit-generated endpoint"""
+        data = {"image_b64": base64.b64encode(image_bytes).decode(), "instruction": instruction}
+        return await self._post("/edit-generated", "engineered_edit", data)
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared client used by every Gradio session
+client = APIClient()
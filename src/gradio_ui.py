@@ -1,60 +1,42 @@
 import gradio as gr
-import requests
-from PIL import Image
-import io
-import base64
 import configparser
 import os
 
-# Load API URL from config.ini
+from src.api_client import client, image_to_png_bytes, bytes_to_image
+
+# Load UI concurrency from config.ini (API URL and client settings are read by src.api_client)
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), "../config.ini"))
-API_URL = config.get("API", "url") 
-
-def b64_to_image(b64str):
-    """Convert base64 string to PIL Image object"""
-    return Image.open(io.BytesIO(base64.b64decode(b64str)))
+CONCURRENCY_LIMIT = config.getint("Client", "concurrency_limit", fallback=32)
 
-def generate_image_workflow(prompt):
+async def generate_image_workflow(prompt):
     """Send prompt to /generate endpoint and return engineered prompt + generated image"""
-    resp = requests.post(f"{API_URL}/generate", data={"prompt": prompt})
-    data = resp.json()
-    img = b64_to_image(data["image"])
-    return data["engineered_prompt"], img, img
+    engineered, img_bytes = await client.generate(prompt)
+    # Keep the server's encoded bytes in state so later edits don't re-encode
+    return engineered, bytes_to_image(img_bytes), img_bytes
 
 def upload_image_workflow(image):
     """Handle uploaded image - display as original and store in state"""
-    # Just show the uploaded image as original and set state
-    return image, image
+    if image is None:
+        return None, None
+    # Encode once on upload; state holds PNG bytes ready to send
+    return image, image_to_png_bytes(image)
 
-def edit_image_workflow(image, instruction):
+async def edit_image_workflow(image_bytes, instruction):
     """Send image file + instruction to /edit endpoint for image editing"""
-    if image is None:
+    if image_bytes is None:
         return "No image to edit!", None, None
-    # Send image and instruction to /edit
-    buf = io.BytesIO()
-    image.save(buf, format="PNG")
-    buf.seek(0)
-    files = {"image": ("image.png", buf, "image/png")}
-    data = {"instruction": instruction}
-    resp = requests.post(f"{API_URL}/edit", files=files, data=data)
-    data = resp.json()
-    img = b64_to_image(data["image"])
-    return data["engineered_edit"], img, img
+    engineered, img_bytes = await client.edit(image_bytes, instruction)
+    img = bytes_to_image(img_bytes)
+    return engineered, img, img
 
-def edit_generated_image_workflow(image, instruction):
+async def edit_generated_image_workflow(image_bytes, instruction):
     """Send base64 image + instruction to /edit-generated endpoint"""
-    if image is None:
+    if image_bytes is None:
         return "No image to edit!", None, None
-    # Convert image to base64
-    buf = io.BytesIO()
-    image.save(buf, format="PNG")
-    img_b64 = base64.b64encode(buf.getvalue()).decode()
-    data = {"image_b64": img_b64, "instruction": instruction}
-    resp = requests.post(f"{API_URL}/edit-generated", data=data)
-    data = resp.json()
-    img = b64_to_image(data["image"])
-    return data["engineered_edit"], img, img
+    engineered, img_bytes = await client.edit_generated(image_bytes, instruction)
+    img = bytes_to_image(img_bytes)
+    return engineered, img, img
 
 def build_ui():
     """Build the main Gradio interface with custom CSS styling"""
@@ -293,6 +275,7 @@ def build_ui():
         
         # Hidden state component to pass images between workflow steps
         # This allows the edit workflow to access the current image (generated or uploaded)
+        # The image is kept as encoded PNG bytes so it can be sent to the API as-is
         # gr.State() creates an invisible component that can store data
         state_image = gr.State()
 
@@ -324,6 +307,9 @@ def build_ui():
 
 if __name__ == "__main__":
     demo = build_ui()
+    # Async handlers wait on the pooled API client without holding a worker thread,
+    # so the queue can run many events (including several per session) at once
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT)
     # Launch Gradio server on port 8048, accessible from any IP, with public sharing enabled
     # server_port=8048: sets the local port number
     # server_name="0.0.0.0": allows connections from any IP address (not just localhost)
@@ -0,0 +1,31 @@
+import threading
+
+import torch
+import torch.nn.functional as F
+from transformers import AutoModel, AutoTokenizer
+
+# Small sentence-embedding model used to match near-duplicate prompts
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+model = AutoModel.from_pretrained(MODEL_NAME).to(device).eval()
+
+EMBEDDING_DIM = model.config.hidden_size
+
+# Fast tokenizers are not safe to call from several threads at once (truncation settings are
+# mutated per call), and lookups run in the server's threadpool
+_lock = threading.Lock()
+
+@torch.no_grad()
+def embed_text(text: str) -> torch.Tensor:
+    """
+    Embed a prompt as a unit-length vector (mean-pooled token embeddings).
+    Returns a 1-D float32 tensor on the CPU.
+    """
+    with _lock:
+        inputs = tokenizer(text, truncation=True, max_length=256, return_tensors="pt").to(device)
+        hidden = model(**inputs).last_hidden_state
+    mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    return F.normalize(pooled, dim=-1)[0].float().cpu()
@@ -0,0 +1,196 @@
+import configparser
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from io import BytesIO
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Load output settings from config.ini
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+config = configparser.ConfigParser()
+config.read(os.path.join(ROOT_DIR, "config.ini"))
+# Relative output_dir is resolved against the repo root, like config.ini, not the working directory
+OUTPUT_DIR = os.path.join(ROOT_DIR, config.get("Output", "output_dir", fallback="output"))
+MAX_FILENAME_LENGTH = config.getint("Output", "max_filename_length", fallback=50)
+THUMBNAIL_SIZE = config.getint("Output", "thumbnail_size", fallback=256)
+QUEUE_SIZE = config.getint("Output", "queue_size", fallback=64)
+INDEX_FILE = config.get("Output", "index_file", fallback="index.jsonl")
+
+
+def safe_filename(prompt: str, max_length: int = MAX_FILENAME_LENGTH) -> str:
+    """Create a filesystem-safe name from a prompt (same scheme as the notebooks)"""
+    safe_prompt = "".join(c for c in prompt if c.isalnum() or c in (" ", "-", "_")).rstrip()
+    return safe_prompt.replace(" ", "_")[:max_length] or "image"
+
+
+class OutputIndex:
+    """
+    Append-only JSON Lines index of saved outputs.
+    Byte offsets of every record are kept in memory so pages can be read with seeks
+    instead of rescanning the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = []
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Partial record from an interrupted write; drop it so appends stay line-aligned
+                    f.truncate(offset)
+                    break
+                self._offsets.append(offset)
+                offset += len(line)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def append(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            self._offsets.append(offset)
+
+    def page(self, offset: int = 0, limit: int = 20, newest_first: bool = True):
+        """Return up to `limit` records starting at `offset`, plus the total count"""
+        with self._lock:
+            total = len(self._offsets)
+            if newest_first:
+                start = max(total - offset - limit, 0)
+                positions = self._offsets[start:max(total - offset, 0)][::-1]
+            else:
+                positions = self._offsets[offset:offset + limit]
+        records = []
+        if positions:
+            with open(self.path, "rb") as f:
+                for pos in positions:
+                    f.seek(pos)
+                    records.append(json.loads(f.readline()))
+        return records, total
+
+
+class OutputWriter:
+    """
+    Background writer that saves finished images, thumbnails and index records off the request path.
+
+    submit() never blocks: the queue is bounded and, when it is full, the new job is dropped
+    (and counted in `dropped`) so a slow disk cannot add latency to the API.
+    """
+
+    def __init__(self, output_dir: str = OUTPUT_DIR, queue_size: int = QUEUE_SIZE, thumbnail_size: int = THUMBNAIL_SIZE):
+        self.output_dir = output_dir
+        self.image_dir = os.path.join(output_dir, "images")
+        self.thumbnail_dir = os.path.join(output_dir, "thumbnails")
+        os.makedirs(self.image_dir, exist_ok=True)
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        self.thumbnail_size = thumbnail_size
+        self.index = OutputIndex(os.path.join(output_dir, INDEX_FILE))
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, png: bytes, kind: str, prompt: str, engineered: str, params: dict = None, timings: dict = None) -> bool:
+        """
+        Queue a finished image (already PNG-encoded for the response) for saving.
+        Returns False if it was dropped because the queue is full.
+        """
+        job = {
+            "png": png,
+            "kind": kind,
+            "prompt": prompt,
+            "engineered": engineered,
+            "params": params or {},
+            "timings": timings or {},
+            "created_at": datetime.now(),
+        }
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Output queue full, dropped %s output (%d dropped so far)", kind, self.dropped)
+            return False
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                break
+            try:
+                self._write(job)
+            except Exception:
+                logger.exception("Failed to save %s output", job["kind"])
+            finally:
+                self._queue.task_done()
+
+    def _write(self, job: dict):
+        start = time.perf_counter()
+        created_at = job["created_at"]
+
+        # Prompt-derived name with timestamp, plus a short id so concurrent saves never collide
+        name = f"{safe_filename(job['prompt'])}_{created_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        image_path = os.path.join(self.image_dir, f"{name}.png")
+        thumbnail_path = os.path.join(self.thumbnail_dir, f"{name}.jpg")
+
+        with open(image_path, "wb") as f:
+            f.write(job["png"])
+        # Decode only to build the thumbnail
+        image = Image.open(BytesIO(job["png"]))
+        thumbnail = image.convert("RGB")
+        thumbnail.thumbnail((self.thumbnail_size, self.thumbnail_size))
+        thumbnail.save(thumbnail_path, format="JPEG", quality=85)
+
+        timings = dict(job["timings"])
+        timings["save_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.index.append({
+            "id": name,
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "kind": job["kind"],
+            "prompt": job["prompt"],
+            "engineered_prompt": job["engineered"],
+            "params": job["params"],
+            "timings": timings,
+            "width": image.width,
+            "height": image.height,
+            "image": os.path.relpath(image_path, self.output_dir),
+            "thumbnail": os.path.relpath(thumbnail_path, self.output_dir),
+        })
+
+    def list_outputs(self, offset: int = 0, limit: int = 20):
+        """Page through saved outputs, newest first, with the number of outputs dropped since startup"""
+        records, total = self.index.page(offset, limit)
+        return {"total": total, "dropped": self.dropped, "offset": offset, "limit": limit, "items": records}
+
+    def close(self, timeout: float = None):
+        """Finish queued writes and stop the worker thread, giving up after `timeout` seconds"""
+        start = time.perf_counter()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Output writer did not drain in time, abandoning %d queued outputs", self._queue.qsize())
+            return
+        if timeout is not None:
+            timeout = max(timeout - (time.perf_counter() - start), 0)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # The stop sentinel is still queued behind the abandoned jobs
+            logger.warning("Output writer did not finish in time, abandoning %d queued outputs", max(self._queue.qsize() - 1, 0))
@@ -0,0 +1,146 @@
+import configparser
+import os
+import threading
+import time
+
+import torch
+
+# Load similarity settings from config.ini
+config = configparser.ConfigParser()
+config.read(os.path.join(os.path.dirname(__file__), "../../config.ini"))
+CAPACITY = config.getint("Similarity", "capacity", fallback=128)
+PROMPT_THRESHOLD = config.getfloat("Similarity", "prompt_threshold", fallback=0.90)
+IMAGE_THRESHOLD = config.getfloat("Similarity", "image_threshold", fallback=0.95)
+
+
+class PromptIndex:
+    """
+    In-memory nearest-neighbour index over past prompts, their engineered prompts and PNG-encoded images.
+
+    Embeddings are stored as unit vectors in one preallocated float16 matrix, so a lookup is a
+    single matrix-vector product. When full, the least recently used entry is evicted.
+
+    Candidate hits count lookups above each threshold; served counts are recorded by the caller
+    with record_served() when a fast path was actually taken.
+    """
+
+    def __init__(self, embed_fn, dim: int, capacity: int = CAPACITY,
+                 prompt_threshold: float = PROMPT_THRESHOLD, image_threshold: float = IMAGE_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.capacity = capacity
+        self.prompt_threshold = prompt_threshold
+        self.image_threshold = image_threshold
+        self._lock = threading.Lock()
+        self._vectors = torch.zeros((capacity, dim), dtype=torch.float16)
+        self._occupied = torch.zeros(capacity, dtype=torch.bool)
+        self._entries = [None] * capacity
+        self._last_used = [0] * capacity
+        self._clock = 0
+        self._next_id = 0
+        self.lookups = 0
+        self.candidate_prompt_hits = 0
+        self.candidate_image_hits = 0
+        self.served_prompt_reuses = 0
+        self.served_image_returns = 0
+        self.lookup_ms_total = 0.0
+
+    def __len__(self):
+        return int(self._occupied.sum())
+
+    def lookup(self, prompt: str):
+        """
+        Embed `prompt` and find its nearest stored neighbour.
+        Returns (match, vector): match is None below `prompt_threshold`, otherwise a dict with
+        "prompt", "engineered", "png", "score", "slot" and "id". The vector can be passed to insert().
+        """
+        start = time.perf_counter()
+        vector = self.embed_fn(prompt)
+        match = None
+        with self._lock:
+            if self._occupied.any():
+                scores = self._vectors.float() @ vector
+                scores[~self._occupied] = -1.0
+                score, slot = scores.max(dim=0)
+                score, slot = float(score), int(slot)
+                if score >= self.prompt_threshold:
+                    self._clock += 1
+                    self._last_used[slot] = self._clock
+                    match = dict(self._entries[slot], score=score, slot=slot)
+            self.lookups += 1
+            if match is not None:
+                self.candidate_prompt_hits += 1
+                if match["score"] >= self.image_threshold:
+                    self.candidate_image_hits += 1
+            self.lookup_ms_total += (time.perf_counter() - start) * 1000
+        return match, vector
+
+    def insert(self, vector: torch.Tensor, prompt: str, engineered: str, png: bytes):
+        """Add an entry, evicting the least recently used one if the index is full"""
+        with self._lock:
+            free = (~self._occupied).nonzero()
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = min(range(self.capacity), key=self._last_used.__getitem__)
+            self._clock += 1
+            self._vectors[slot] = vector.to(torch.float16)
+            self._occupied[slot] = True
+            self._next_id += 1
+            self._entries[slot] = {"prompt": prompt, "engineered": engineered, "png": png, "id": self._next_id}
+            self._last_used[slot] = self._clock
+
+    def update(self, match: dict, vector: torch.Tensor, prompt: str, engineered: str, png: bytes) -> bool:
+        """
+        Replace a matched entry with a newer prompt, embedding, engineered prompt and image instead of
+        inserting a near-duplicate, so the stored image always belongs to the stored prompt.
+        Returns False if the entry was evicted since the lookup.
+        """
+        with self._lock:
+            slot = match["slot"]
+            entry = self._entries[slot]
+            if entry is None or entry["id"] != match["id"]:
+                return False
+            self._clock += 1
+            self._vectors[slot] = vector.to(torch.float16)
+            entry["prompt"] = prompt
+            entry["engineered"] = engineered
+            entry["png"] = png
+            self._last_used[slot] = self._clock
+            return True
+
+    def record_served(self, fast_path: str):
+        """Count a fast-path response that was actually served ("prompt" or "image")"""
+        with self._lock:
+            if fast_path == "prompt":
+                self.served_prompt_reuses += 1
+            elif fast_path == "image":
+                self.served_image_returns += 1
+
+    def clear(self):
+        """Evict every entry"""
+        with self._lock:
+            self._vectors.zero_()
+            self._occupied.zero_()
+            self._entries = [None] * self.capacity
+            self._last_used = [0] * self.capacity
+
+    def stats(self) -> dict:
+        """Lookup latency and hit rates since startup"""
+        with self._lock:
+            lookups = self.lookups
+            return {
+                "entries": len(self),
+                "capacity": self.capacity,
+                "lookups": lookups,
+                "candidate_prompt_hits": self.candidate_prompt_hits,
+                "candidate_image_hits": self.candidate_image_hits,
+                "candidate_prompt_hit_rate": self.candidate_prompt_hits / lookups if lookups else 0.0,
+                "candidate_image_hit_rate": self.candidate_image_hits / lookups if lookups else 0.0,
+                "served_prompt_reuses": self.served_prompt_reuses,
+                "served_image_returns": self.served_image_returns,
+                "served_prompt_reuse_rate": self.served_prompt_reuses / lookups if lookups else 0.0,
+                "served_image_return_rate": self.served_image_returns / lookups if lookups else 0.0,
+                "avg_lookup_ms": self.lookup_ms_total / lookups if lookups else 0.0,
+                "prompt_threshold": self.prompt_threshold,
+                "image_threshold": self.image_threshold,
+            }